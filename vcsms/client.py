@@ -1,8 +1,9 @@
 """Defines the Client class for messaging other VCSMS clients."""
 
+import hashlib
 import threading
 import os
-import random
+import secrets
 import re
 import time
 import json
@@ -10,7 +11,7 @@ from json.decoder import JSONDecodeError
 from typing import Callable
 
 from .queue import Queue
-from .cryptography import dhke, sha256, aes256, rsa
+from .cryptography import dhke, aes256, rsa
 from .cryptography.utils import i_to_b
 from .cryptography.exceptions import CryptographyException
 from .server_connection import ServerConnection
@@ -328,10 +329,10 @@ class Client:
             else:
                 self._logger.log(f"User {recipient} not found.", 1)
                 raise UserNotFoundException(recipient)
-        dh_priv = random.randrange(1, self._dhke_group[1])
-        index = random.randrange(1, 2 ** 64)
+        dh_priv = secrets.randbelow(self._dhke_group[1] - 1) + 1
+        index = secrets.randbelow(2 ** 64 - 1) + 1
         while index in self._messages:
-            index = random.randrange(1, 2 ** 64)
+            index = secrets.randbelow(2 ** 64 - 1) + 1
         dh_pub, dh_sig = signing.gen_signed_dh(
             dh_priv, self._priv, self._dhke_group, index)
         self._messages[index] = {
@@ -368,10 +369,10 @@ class Client:
         db.insert_group_message(group, message, self._id)
         for recipient in recipients:
             if recipient != self._id:
-                dh_priv = random.randrange(1, self._dhke_group[1])
-                index = random.randrange(1, 2**64)
+                dh_priv = secrets.randbelow(self._dhke_group[1] - 1) + 1
+                index = secrets.randbelow(2**64 - 1) + 1
                 while index in self._messages:
-                    index = random.randrange(1, 2**64)
+                    index = secrets.randbelow(2**64 - 1) + 1
                 dh_pub, dh_sig = signing.gen_signed_dh(dh_priv, self._priv, self._dhke_group, index)
                 self._messages[index] = {
                     "client_id": recipient,
@@ -408,9 +409,9 @@ class Client:
                 member_ids.append(member_id)
 
         if len(member_ids) > 0:
-            group_id = random.randrange(1, 2**64)
+            group_id = secrets.randbelow(2**64 - 1) + 1
             while db.get_group_name(group_id):
-                group_id = random.randrange(1, 2**64)
+                group_id = secrets.randbelow(2**64 - 1) + 1
             if db.get_group_id(name) or db.get_id(name):
                 self._logger.log(f"Name {name} already in use.", 1)
                 raise GroupNameInUseException(name)
@@ -483,8 +484,8 @@ class Client:
                 self._name_salt = aes256.decrypt_cbc(salt_encrypted, self._local_encryption_key, salt_iv)
         else:
             with open(os.path.join(self._app_dir, "names.salt"), 'w+', encoding='utf-8') as f:
-                self._name_salt = random.randbytes(256)
-                salt_iv = random.randrange(1, 2**128)
+                self._name_salt = os.urandom(256)
+                salt_iv = int.from_bytes(os.urandom(16), 'big')
                 salt_encrypted = aes256.encrypt_cbc(self._name_salt, self._local_encryption_key, salt_iv)
                 salt_iv_hex = hex(salt_iv)[2:]
                 salt_encrypted_hex = salt_encrypted.hex()
@@ -533,9 +534,9 @@ class Client:
         Args:
             client_id (str): The client ID to request.
         """
-        request_index = random.randrange(1, 2**64)
+        request_index = secrets.randbelow(2**64 - 1) + 1
         while request_index in self._key_requests:
-            request_index = random.randrange(1, 2**64)
+            request_index = secrets.randbelow(2**64 - 1) + 1
         self._key_requests[request_index] = client_id
         message = self._message_parser.construct_message("0", "GetKey", request_index, client_id)
         try:
@@ -572,7 +573,7 @@ class Client:
             encrypted_statuses_json = {}
             for index,message in self._messages.items():
                 message_status_json = json.dumps(message)
-                initialisation_vector = random.randrange(1, 2**128)
+                initialisation_vector = int.from_bytes(os.urandom(16), 'big')
                 encrypted_message_status = aes256.encrypt_cbc(message_status_json.encode('utf-8'), self._local_encryption_key, initialisation_vector)
                 encrypted_statuses_json[index] = f"{initialisation_vector}:{encrypted_message_status.hex()}"
             json.dump(encrypted_statuses_json, f)
@@ -597,8 +598,8 @@ class Client:
         This should only get run on the first run of the client program.
         """
         with open(os.path.join(self._app_dir, "keytest"), 'w+', encoding='utf-8') as f:
-            data = random.randbytes(1024)
-            aes_iv = random.randrange(0, 2**128)
+            data = os.urandom(1024)
+            aes_iv = int.from_bytes(os.urandom(16), 'big')
             encrypted_data = aes256.encrypt_cbc(data, self._local_encryption_key, aes_iv)
             f.write(f"{data.hex()}:{hex(aes_iv)[2:]}:{encrypted_data.hex()}")
 
@@ -627,15 +628,17 @@ class Client:
         Keeps checking for new messages and processes them on a new thread as they arrive.
         """
         while self._server.connected:
-            if self._server.new:
-                try:
-                    msg = self._server.recv()
-                except ConnectionException as exc:
-                    self._logger.log(f"Could not receive data from server: {exc}", 1)
-                    continue
-                t_process = threading.Thread(
-                    target=self._process_message, args=(msg,))
-                t_process.start()
+            try:
+                # sleeps on the incoming queue rather than polling it
+                msg = self._server.recv()
+            except ConnectionException as exc:
+                self._logger.log(f"Could not receive data from server: {exc}", 1)
+                continue
+            if msg is None:  # the connection closed while waiting
+                break
+            t_process = threading.Thread(
+                target=self._process_message, args=(msg,))
+            t_process.start()
         if self._running:
             self._handle_disconnect()
 
@@ -819,9 +822,9 @@ class Client:
                         return None
                 signature_data = f"IDINUSE{group_id}{self._id}".encode('utf-8')
                 if signing.verify(signature_data, signature, db.get_key(sender)):
-                    new_group_id = random.randrange(1, 2**64)
+                    new_group_id = secrets.randbelow(2**64 - 1) + 1
                     while db.get_group_name(new_group_id):
-                        new_group_id = random.randrange(1, 2**64)
+                        new_group_id = secrets.randbelow(2**64 - 1) + 1
                     db.change_group_id(group_id, new_group_id)
                     for member in group_members:
                         if member != sender:
@@ -978,12 +981,12 @@ class Client:
                 f"Invalid Diffie Hellman signature from {sender}", 1)
             return "InvalidSignature", ("NewMessage", message_index, )
         db.close()
-        dh_priv = random.randrange(1, self._dhke_group[1])
+        dh_priv = secrets.randbelow(self._dhke_group[1] - 1) + 1
         dh_pub, dh_pub_sig = signing.gen_signed_dh(
             dh_priv, self._priv, self._dhke_group, message_index)
         shared_secret = dhke.calculate_shared_key(
             dh_priv, sender_dh_pub, self._dhke_group)
-        encryption_key = sha256.hash(i_to_b(shared_secret))
+        encryption_key = int.from_bytes(hashlib.sha256(i_to_b(shared_secret)).digest(), 'big')
         self._messages[message_index] = {
             "client_id": sender,
             "public_key": sender_dh_pub,
@@ -1033,12 +1036,12 @@ class Client:
             dh_priv = self._messages[message_index]["dh_private"]
             shared_secret = dhke.calculate_shared_key(
                 dh_priv, sender_dh_pub, self._dhke_group)
-            encryption_key = sha256.hash(i_to_b(shared_secret))
+            encryption_key = int.from_bytes(hashlib.sha256(i_to_b(shared_secret)).digest(), 'big')
             plaintext = json.dumps({
                 "data": self._messages[message_index]["data"],
                 "group": self._messages[message_index]["group"]
             }).encode('utf-8')
-            aes_iv = random.randrange(2, 2 ** 128)
+            aes_iv = int.from_bytes(os.urandom(16), 'big')
             ciphertext = aes256.encrypt_cbc(plaintext, encryption_key, aes_iv)
             self._messages.pop(message_index)
             return "MessageData", (message_index, aes_iv, ciphertext)
@@ -1124,7 +1127,7 @@ class Client:
             if sender == self._messages[message_index]["client_id"]:
                 self._logger.log(f"Requested message index {message_index} from {sender} but it was already in use", 3)
                 message = self._messages[message_index]
-                new_id = random.randrange(1, 2 ** 64)
+                new_id = secrets.randbelow(2 ** 64 - 1) + 1
                 self._messages.pop(message_index)
                 self._messages[new_id] = message
                 dh_private = message["dh_private"]
@@ -1140,7 +1143,7 @@ class Client:
             if identifier in self._messages:
                 message = self._messages[identifier]
                 if sender == message["client_id"]:
-                    new_private_key = random.randrange(2, self._dhke_group[1])
+                    new_private_key = secrets.randbelow(self._dhke_group[1] - 2) + 2
                     new_pub, sig = signing.gen_signed_dh(new_private_key, self._priv, self._dhke_group, identifier)
                     message["dh_private"] = new_private_key
                     return "NewMessage", (identifier, new_pub, sig)
@@ -1151,12 +1154,12 @@ class Client:
             if identifier in self._messages:
                 message = self._messages[identifier]
                 if sender == message["client_id"]:
-                    new_private_key = random.randrange(2, self._dhke_group[1])
+                    new_private_key = secrets.randbelow(self._dhke_group[1] - 2) + 2
                     new_pub, sig = signing.gen_signed_dh(new_private_key, self._priv, self._dhke_group, identifier)
                     shared_secret = dhke.calculate_shared_key(
                         new_private_key, message["public_key"], self._dhke_group
                     )
-                    message["encryption_key"] = sha256.hash(i_to_b(shared_secret))
+                    message["encryption_key"] = int.from_bytes(hashlib.sha256(i_to_b(shared_secret)).digest(), 'big')
                     return "MessageAccept", (identifier, new_pub, sig)
                 return "NotAllowed", ("InvalidSignature", )
             return "NoSuchIndex", (identifier, )
@@ -1,3 +1,20 @@
+import functools
+
+try:
+    import gmpy2
+    _GMP_AVAILABLE = True
+except ImportError:
+    _GMP_AVAILABLE = False
+
+
+@functools.lru_cache(maxsize=None)
+def _mpz(value: int):
+    """Convert an integer to a cached gmpy2 mpz.
+    The group generators and moduli are fixed constants so converting them
+    once at first use avoids re-allocating a multi-kilobit mpz per modexp.
+    """
+    return gmpy2.mpz(value)
+
 group5_1536 = (2, 0xFFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74020BBEA63B139B22514A08798E3404DDEF9519B3CD3A431B302B0A6DF25F14374FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7EDEE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF0598DA48361C55D39A69163FA8FD24CF5F83655D23DCA3AD961C62F356208552BB9ED529077096966D670C354E4ABC9804F1746C08CA237327FFFFFFFFFFFFFFFF)
 
 group14_2048 = (2, 0xFFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74020BBEA63B139B22514A08798E3404DDEF9519B3CD3A431B302B0A6DF25F14374FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7EDEE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF0598DA48361C55D39A69163FA8FD24CF5F83655D23DCA3AD961C62F356208552BB9ED529077096966D670C354E4ABC9804F1746C08CA18217C32905E462E36CE3BE39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF6955817183995497CEA956AE515D2261898FA051015728E5A8AACAA68FFFFFFFFFFFFFFFF)
@@ -22,6 +39,8 @@ def generate_public_key(private_key: int, group: tuple) -> int:
     Returns:
         int: The diffie hellman public key to be shared
     """
+    if _GMP_AVAILABLE:
+        return int(gmpy2.powmod(_mpz(group[0]), private_key, _mpz(group[1])))
     return pow(group[0], private_key, group[1])
 
 
@@ -36,4 +55,6 @@ def calculate_shared_key(private_key: int, peer_public_key: int, group: tuple) -
     Returns:
         int: The established shared secret
     """
+    if _GMP_AVAILABLE:
+        return int(gmpy2.powmod(peer_public_key, private_key, _mpz(group[1])))
     return pow(peer_public_key, private_key, group[1])
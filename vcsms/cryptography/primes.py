@@ -12,20 +12,21 @@ def sieve_of_eratosthenes(maximum: int) -> list:
     Returns:
         list: All the primes up to the maximum
     """
-    primes = [0] * (maximum - 1)
-    # 0th index = 2
-    i = 2
-    while i < math.sqrt(maximum):
-        if primes[i - 2] == 0:
-            for j in range(i ** 2, maximum + 1, i):
-                primes[j - 2] = 1
-        i += 1
-
-    return [x + 2 for x in filter(lambda n: primes[n] == 0, range(len(primes)))]
+    sieve = bytearray(b'\x01' * (maximum + 1))
+    sieve[0] = sieve[1] = 0
+    for i in range(2, math.isqrt(maximum) + 1):
+        if sieve[i]:
+            # knock out every multiple of i in one slice assignment
+            sieve[i * i::i] = bytes(len(range(i * i, maximum + 1, i)))
+    return [i for i in range(2, maximum + 1) if sieve[i]]
 
 
 primes_up_to_1_million = sieve_of_eratosthenes(1000000)  # calculated on module import
 
+# product of the first 2000 primes. a single gcd against this rejects any
+# candidate with a small factor far faster than dividing by each prime in turn.
+PRIMORIAL = math.prod(primes_up_to_1_million[:2000])
+
 
 def miller_rabin_primality_test(n: int, r: int):
     if n % 2 == 0 or n == 1:
@@ -42,21 +43,20 @@ def miller_rabin_primality_test(n: int, r: int):
         b = pow(a, d, n)
         if b in {1, n - 1}:   # +- 1 (mod n)
             continue
-        for _ in range(s):
-            check_next = False
+        for _ in range(s - 1):
             b = pow(b, 2, n)
             if b == n - 1:  # likely is prime (divides n)
-                check_next = True
                 break
-        if not check_next:
+        else:
             return False
     return True
 
 
 def is_prime(x: int):
-    for p in primes_up_to_1_million:
-        if x % p == 0 and p != x:
-            return False
-    if miller_rabin_primality_test(x, 100):
+    shared = math.gcd(x, PRIMORIAL)
+    if shared != 1:
+        # x has a small prime factor so is composite unless it is that prime
+        return shared == x and x in primes_up_to_1_million[:2000]
+    if miller_rabin_primality_test(x, 40):
         return True
     return False
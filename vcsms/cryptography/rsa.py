@@ -1,8 +1,16 @@
+import multiprocessing
+import os
 import random
 from . import primes
 from .utils import i_to_b
 from .exceptions import DataTooLong, DecryptionFailureException
 
+try:
+    import gmpy2
+    _GMP_AVAILABLE = True
+except ImportError:
+    _GMP_AVAILABLE = False
+
 def gcd_extended_euclid(a: int, b: int) -> tuple:
     """Recursively calculate the GCD of two integers a and b 
     and also the values s and t such that at + bs = gcd (a,b).
@@ -85,6 +93,8 @@ def encrypt(plaintext: bytes, exponent: int, modulus: int) -> bytes:
     if len(plaintext) * 8 > modulus.bit_length():
         raise DataTooLong(plaintext)
     plaintext_as_int = int.from_bytes(b'RSA' + plaintext, 'big')
+    if _GMP_AVAILABLE:
+        return i_to_b(int(gmpy2.powmod(plaintext_as_int, exponent, modulus)))
     return i_to_b(pow(plaintext_as_int, exponent, modulus))
 
 
@@ -100,13 +110,37 @@ def decrypt(ciphertext: bytes, exponent: int, modulus: int) -> bytes:
         bytes: The decrypted plaintext
     """
 
-    plaintext = i_to_b(pow(int.from_bytes(ciphertext, 'big'), exponent, modulus))
+    ciphertext_as_int = int.from_bytes(ciphertext, 'big')
+    if _GMP_AVAILABLE:
+        plaintext = i_to_b(int(gmpy2.powmod(ciphertext_as_int, exponent, modulus)))
+    else:
+        plaintext = i_to_b(pow(ciphertext_as_int, exponent, modulus))
     if plaintext[:3] == b'RSA':
         return plaintext[3:]
     else:
         raise DecryptionFailureException(exponent)
 
 
+def _find_prime(length: int) -> int:
+    """Search random candidates until one is prime and return it.
+
+    Runs in a worker process during key generation so the RNG is reseeded
+    first: forked workers inherit the parent's generator state and would
+    otherwise all search exactly the same candidates.
+
+    Args:
+        length (int): The bit length of the prime to search for.
+
+    Returns:
+        int: A prime number of at most the given bit length.
+    """
+    random.seed(os.urandom(32))
+    p = random.randrange(1, 2**length)
+    while not primes.is_prime(p):
+        p = random.randrange(1, 2**length)
+    return p
+
+
 def gen_keypair(length: int = 2048):
     """Generate an RSA keypair with a given length modulus.
 
@@ -116,16 +150,17 @@ def gen_keypair(length: int = 2048):
     Returns:
         tuple: (public exponent, modulus), (private exponent, modulus)
     """
+    if length % 2 != 0:
+        raise ValueError("INVALID KEYLENGTH. MUST BE EVEN.")
+
     while True:
-        if length % 2 != 0:
-            raise ValueError("INVALID KEYLENGTH. MUST BE EVEN.")
-
-        p = random.randrange(1, 2**(length//2))
-        while not primes.is_prime(p):
-            p = random.randrange(1, 2**(length//2))
-        q = random.randrange(1, 2**(length//2))
-        while not primes.is_prime(q):
-            q = random.randrange(1, 2**(length//2))
+        # the prime search is embarrassingly parallel: race one candidate
+        # stream per core and take the first two primes reported back
+        workers = os.cpu_count() or 1
+        with multiprocessing.Pool(workers) as pool:
+            found = pool.imap_unordered(_find_prime, [length // 2] * max(workers, 2))
+            p = next(found)
+            q = next(found)
 
         pub, priv = calculate_keys(p, q)
         try:
@@ -1,14 +1,18 @@
 import socket
+import struct
 import threading
 import time
 from .queue import Queue
 from .exceptions.socket import *
 
+_KEEPALIVE_FRAME = struct.pack('>I', 0)
+
 
 class ImprovedSocket:
-    """A wrapper class for an existing tcp socket which provides a more reliable connection. The bytes \\xfe and \\xff are reserved.
+    """A wrapper class for an existing tcp socket which provides a more reliable message-based connection.
+    Each message is framed with a 4 byte big endian length prefix so arbitrary binary payloads can be carried.
     """
-    def __init__(self, _sock: socket.socket, block_size: int = 4096):
+    def __init__(self, _sock: socket.socket, block_size: int = 65536):
         """Initialise an instance of the NonStreamSocket class.
 
         Args:
@@ -18,38 +22,53 @@ class ImprovedSocket:
         self._sock = _sock
         self._block_size = block_size
         self._queue = Queue()
-        self._incoming_in_progress = b''
+        self._recv_buffer = bytearray(block_size)
+        self._incoming_in_progress = bytearray()
         self._outgoing_in_progress = b''
         self._send_lock = threading.Lock()
         self._open = False
 
     def _checklife_thread(self):
-        """Constantly attempts to send the byte \\xfe
-        to the connected socket to test if it is still connected. 
+        """Constantly attempts to send an empty (zero length) frame
+        to the connected socket to test if it is still connected.
         Once it is not it closes the socket.
         """
         while self._open:
             time.sleep(1)
             try:
                 with self._send_lock:
-                    self._sock.sendall(b'\xfe')
+                    self._sock.sendall(_KEEPALIVE_FRAME)
             except OSError:
                 self.close()
 
     def _in_thread(self):
-        """Receives incoming data, parses it, and
-         splits it into separate messages using the delimiter \\xff.
+        """Receives incoming data, parses it, and splits it into
+        separate messages using each message's 4 byte big endian
+        length prefix. Empty frames are keepalive probes and are discarded.
         """
         while self._open:
             try:
-                data = self._sock.recv(self._block_size)
-                for c in data:
-                    byte = c.to_bytes(1, 'big')
-                    if byte == b'\xff':
-                        self._queue.push(self._incoming_in_progress)
-                        self._incoming_in_progress = b''
-                    elif byte != b'\xfe':
-                        self._incoming_in_progress += byte
+                count = self._sock.recv_into(self._recv_buffer)
+                if self._incoming_in_progress:
+                    self._incoming_in_progress += memoryview(self._recv_buffer)[:count]
+                    data = self._incoming_in_progress
+                else:
+                    # no partial frame carried over: parse straight out of the
+                    # receive buffer so complete frames are copied only once
+                    data = memoryview(self._recv_buffer)[:count]
+                consumed = 0
+                while len(data) - consumed >= 4:
+                    length = struct.unpack_from('>I', data, consumed)[0]
+                    if len(data) - consumed < 4 + length:
+                        break
+                    if length > 0:
+                        self._queue.push(bytes(data[consumed + 4:consumed + 4 + length]))
+                    consumed += 4 + length
+                if data is self._incoming_in_progress:
+                    if consumed > 0:
+                        del self._incoming_in_progress[:consumed]
+                elif consumed < len(data):
+                    self._incoming_in_progress += data[consumed:]
             except (OSError, BrokenPipeError):
                 self.close()
             
@@ -77,6 +96,7 @@ class ImprovedSocket:
                 except (OSError, BrokenPipeError):
                     pass  # connection has already closed
                 self._sock.close()
+            self._queue.push(None)  # wake any thread blocked in recv
 
     @property
     def connected(self) -> bool:
@@ -87,30 +107,74 @@ class ImprovedSocket:
         """
         return self._open
 
-    def send(self, data: bytes):
-        """Send the data given.
+    def send(self, *parts: bytes):
+        """Send the data given as one message.
 
         Args:
-            data (bytes): The payload to send.
+            parts (bytes...): One or more buffers making up the payload to send.
+                Passing the pieces of a message separately avoids concatenating
+                them in userspace as the kernel gathers them via sendmsg.
         """
         if self.connected:
+            length = sum(len(part) for part in parts)
+            header = struct.pack('>I', length)
             try:
                 with self._send_lock:
-                    self._sock.sendall(data + b'\xff')
+                    sent = self._sock.sendmsg([header, *parts])
+                    if sent < 4 + length:
+                        # rare partial write: flush the remainder with sendall
+                        self._sock.sendall(b''.join([header, *parts])[sent:])
             except (OSError, BrokenPipeError):
                 self.close()
                 raise DisconnectedException()
         else:
             raise NotConnectedException()
 
-    def recv(self) -> bytes:
+    def send_many(self, messages: list):
+        """Send several messages in a single gathered write.
+
+        Args:
+            messages (list): A list of payloads, each given as a tuple of
+                one or more buffers making up that message. All the frames
+                go to the kernel in one sendmsg call rather than one
+                syscall per message.
+        """
+        if not self.connected:
+            raise NotConnectedException()
+        buffers = []
+        total = 0
+        for parts in messages:
+            length = sum(len(part) for part in parts)
+            buffers.append(struct.pack('>I', length))
+            buffers.extend(parts)
+            total += 4 + length
+        try:
+            with self._send_lock:
+                sent = self._sock.sendmsg(buffers)
+                if sent < total:
+                    # rare partial write: flush the remainder with sendall
+                    self._sock.sendall(b''.join(buffers)[sent:])
+        except (OSError, BrokenPipeError):
+            self.close()
+            raise DisconnectedException()
+
+    def recv(self, timeout: float = None) -> bytes:
         """Block until a new piece of data is available and then return it.
 
+        Args:
+            timeout (float, optional): The maximum number of seconds to wait
+                for data. None = wait forever. (Defaults to None)
+
         Returns:
-            bytes: The received piece of data.
+            bytes: The received piece of data, or None if the timeout expired.
         """
         if self.connected:
-            return self._queue.pop()
+            data = self._queue.pop(timeout)
+            if data is None:
+                if not self.connected:  # the socket closed while we were blocked
+                    raise DisconnectedException()
+                return None  # the timeout expired
+            return data
         raise NotConnectedException()
 
     @property
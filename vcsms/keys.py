@@ -1,6 +1,7 @@
 """Defines a number of methods for interacting with cryptographic keys."""
 
-from .cryptography import rsa, sha256, aes256
+from .cryptography import rsa, aes256
+import hashlib
 import random
 
 
@@ -75,8 +76,9 @@ def fingerprint(key: tuple[int, int], fp_length: int = 32) -> str:
     """
     if fp_length > 64 or fp_length <= 1:
         raise ValueError(f"Fingerprint length must not be greater than 64 or less than 1. ({fp_length}) provided.")
-    serialised_key = hex(key[0])[2:].encode() + hex(key[1])[2:].encode()
-    fp = sha256.hash_hex(serialised_key)[2:fp_length + 2]
+    exponent_bytes = key[0].to_bytes((key[0].bit_length() + 7) // 8, 'big')
+    modulus_bytes = key[1].to_bytes((key[1].bit_length() + 7) // 8, 'big')
+    fp = hashlib.sha256(exponent_bytes + modulus_bytes).hexdigest()[:fp_length]
     return fp
 
 def derive_key(password: str, iterations: int = 5000) -> int:
@@ -88,5 +90,5 @@ def derive_key(password: str, iterations: int = 5000) -> int:
     """
     key = password.encode('utf-8')
     for _ in range(iterations - 1):
-        key = sha256.hash_hex(key).encode('utf-8')
-    return sha256.hash(key)
\ No newline at end of file
+        key = hashlib.sha256(key).hexdigest().encode('utf-8')
+    return int.from_bytes(hashlib.sha256(key).digest(), 'big')
\ No newline at end of file
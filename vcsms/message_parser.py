@@ -36,6 +36,23 @@ class MessageParser:
         self._incoming = incoming_message_types
         self._outgoing = outgoing_message_types
         self._response_map = response_map
+        # resolve each known message type to its handler up front so
+        # dispatch is a single dict lookup rather than walking the
+        # direct/default fallback chain for every message
+        self._handlers = {name: handler for name, handler in response_map.items()
+                          if name not in ("default", "unknown")}
+        if "default" in response_map:
+            for message_type in incoming_message_types:
+                if message_type not in self._handlers:
+                    self._handlers[message_type] = self._bind_default(response_map["default"], message_type)
+
+    @staticmethod
+    def _bind_default(handler: Callable, message_type: str) -> Callable:
+        """Wrap the default handler so it presents the same call signature
+        as a direct handler for a given message type."""
+        def bound(sender: str, *values):
+            return handler(sender, message_type, list(values))
+        return bound
 
     def _interpret_message_values(self, values: list[bytes], message_type: str) -> list[any]:
         """Convert an array of raw bytestrings to the types specified by the message type schema.
@@ -224,24 +241,13 @@ class MessageParser:
         Returns:
             bytes: The response message as raw bytes.
         """
-        if message_type in self._response_map:
-            response = self._response_map[message_type](sender, *values)
-            if response:
-                if override_recipient_field:
-                    return self.construct_message(override_recipient_field, response[0], *(response[1]))
-                return self.construct_message(sender, response[0], *(response[1]))
-        elif message_type in self._incoming:
-            if "default" in self._response_map:
-                response = self._response_map["default"](sender, message_type, values)
-                if response:
-                    if override_recipient_field:
-                        return self.construct_message(override_recipient_field, response[0], *(response[1]))
-                    return self.construct_message(sender, response[0], *(response[1]))
+        handler = self._handlers.get(message_type)
+        if handler is not None:
+            response = handler(sender, *values)
+        elif message_type not in self._incoming and "unknown" in self._response_map:
+            response = self._response_map["unknown"](sender, message_type, values)
         else:
-            if "unknown" in self._response_map:
-                response = self._response_map["unknown"](sender, message_type, values)
-                if response:
-                    if override_recipient_field:
-                        return self.construct_message(override_recipient_field, response[0], *(response[1]))
-                    return self.construct_message(sender, response[0], *(response[1]))
+            return b''
+        if response:
+            return self.construct_message(override_recipient_field or sender, response[0], *(response[1]))
         return b''
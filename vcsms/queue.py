@@ -1,39 +1,54 @@
-from threading import Lock
+from collections import deque
+from threading import Condition
 
 class Queue:
-    def __init__(self):
-        self.queue = []
-        self.lock = Lock()
+    def __init__(self, maxsize: int = 0):
+        """Initialise a Queue.
+
+        Args:
+            maxsize (int, optional): The maximum number of items the queue
+                will hold. 0 = unbounded. (Defaults to 0)
+        """
+        self.queue = deque()
+        self.available = Condition()
+        self.maxsize = maxsize
+
+    def push(self, item: any) -> bool:
+        """Push an item to the back of the queue.
+        If the queue is bounded and full the item is dropped.
 
-    def push(self, item: any):
-        """Push an item to the back of the queue
-        
         Args:
             item (any): The item to push.
+
+        Returns:
+            bool: Whether the item was queued (False if dropped).
         """
-        self.lock.acquire()
-        self.queue.append(item)
-        self.lock.release()
+        with self.available:
+            if self.maxsize and len(self.queue) >= self.maxsize:
+                return False
+            self.queue.append(item)
+            self.available.notify()
+            return True
 
-    def pop(self) -> any:
+    def pop(self, timeout: float = None) -> any:
         """Pop the item at the front of the queue.
-        If the queue is empty, block until an item is available.
+        If the queue is empty, block until an item is available
+        or the timeout (if given) expires.
+
+        Args:
+            timeout (float, optional): The maximum number of seconds to
+                wait for an item. None = wait forever. (Defaults to None)
 
         Returns:
-            any: The first item in the queue. 
+            any: The first item in the queue, or None if the timeout expired.
         """
-        while True:
-            self.lock.acquire()
-            if len(self.queue) != 0:
-                item = self.queue.pop(0)
-                self.lock.release()
-                return item
-            self.lock.release()
+        with self.available:
+            while len(self.queue) == 0:
+                if not self.available.wait(timeout):
+                    return None
+            return self.queue.popleft()
 
     @property
     def empty(self) -> bool:
         """Whether the queue currently contains 0 elements"""
-        self.lock.acquire()
-        isempty = len(self.queue) == 0
-        self.lock.release()
-        return isempty
+        return len(self.queue) == 0
@@ -1,13 +1,17 @@
+import hashlib
+import hmac
+import os
 import socket
-import random
+import secrets
 import threading
+from collections import OrderedDict
 
 from . import keys
 from . import signing
 from .queue import Queue
 from .server_db import Server_DB
 from .logger import Logger
-from .cryptography import dhke, sha256, aes256, utils
+from .cryptography import dhke, aes256
 from .cryptography.exceptions import CryptographyException, DecryptionFailureException
 from .improved_socket import ImprovedSocket
 from .message_parser import MessageParser
@@ -25,6 +29,10 @@ INCOMING_MESSAGE_TYPES = {
     "MessageDecryptionFailure": ([], [])
 }
 
+MAX_CACHED_OUTBOXES = 4096
+OUTBOX_MAXSIZE = 1024
+MAX_CACHED_PUBKEYS = 4096
+
 OUTGOING_MESSAGE_TYPES = {
     "KeyFound": ([int, int, int], [10, 16, 16]),
     "KeyNotFound": ([int], [10]),
@@ -53,11 +61,21 @@ class Server:
         self._port = port
         self._pub = keypair[0]
         self._priv = keypair[1]
+        # the server's identity packet never changes so serialise it once:
+        # a 2 byte exponent length followed by the raw exponent and modulus bytes
+        pub_exp = self._pub[0].to_bytes((self._pub[0].bit_length() + 7) // 8, 'big')
+        pub_mod = self._pub[1].to_bytes((self._pub[1].bit_length() + 7) // 8, 'big')
+        self._pub_blob = len(pub_exp).to_bytes(2, 'big') + pub_exp + pub_mod
         self._dhke_group = dhke.group14_2048
-        self._client_outboxes = {}
+        self._dhke_mod_len = (self._dhke_group[1].bit_length() + 7) // 8
+        self._client_outboxes = OrderedDict()
+        self._outbox_lock = threading.Lock()
         self._client_sockets = {}
         self._db_path = db_path
+        self._db_local = threading.local()
         self._pubkey_path = pubkey_directory
+        self._pubkey_cache = OrderedDict()
+        self._pubkey_cache_lock = threading.Lock()
         self._logger = logger
         response_map = {
             "GetKey": self._handler_get_key,
@@ -65,19 +83,27 @@ class Server:
             "default": self._handler_default
         }
         self._message_parser = MessageParser(INCOMING_MESSAGE_TYPES, OUTGOING_MESSAGE_TYPES, response_map)
+        # the zero-argument error replies never vary, so build each frame once
+        # rather than re-serialising it for every malformed message received
+        self._error_frames = {
+            name: self._message_parser.construct_message("0", name)
+            for name in ("CiphertextMalformed", "MessageMalformed", "MessageDecryptionFailure")
+        }
 
     def run(self):
         """Begin listening for and processing connections from clients. This should be the first method that is called by this class."""
         l_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         l_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        l_sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 << 20)
+        l_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 << 20)
         l_sock.bind((self._addr, self._port))
         l_sock.listen(30)
         db = self._db_connect()
         db.setup_db()
-        db.close()
         self._logger.log(f"Running on {self._addr}:{self._port}", 0)
         while True:
             conn, addr = l_sock.accept()
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             self._logger.log(f"New connection from: {addr}", 2)
             ns_sock = ImprovedSocket(conn)
             ns_sock.run()
@@ -91,10 +117,30 @@ class Server:
             client (str): The client ID to send the message to
             message (bytes): The raw message bytes to send.
         """
-        if client not in self._client_outboxes:
-            self._logger.log(f"Message to offline/unknown user {client}", 3)
-            self._client_outboxes[client] = Queue()
-        self._client_outboxes[client].push(message)
+        with self._outbox_lock:
+            if client in self._client_outboxes:
+                self._client_outboxes.move_to_end(client)
+            else:
+                self._logger.log(f"Message to offline/unknown user {client}", 3)
+                self._client_outboxes[client] = Queue(maxsize=OUTBOX_MAXSIZE)
+                self._evict_stale_outboxes()
+            outbox = self._client_outboxes[client]
+        if not outbox.push(message):
+            self._logger.log(f"Outbox full for {client}. Dropping message.", 2)
+
+    def _evict_stale_outboxes(self):
+        """Evict the least recently used outboxes of offline clients until the
+        outbox cache is under its size cap. Must be called with the outbox lock held.
+        """
+        for _ in range(len(self._client_outboxes)):
+            if len(self._client_outboxes) <= MAX_CACHED_OUTBOXES:
+                break
+            stale_id, stale_outbox = self._client_outboxes.popitem(last=False)
+            if stale_id in self._client_sockets:
+                # never evict an outbox a live client thread is draining
+                self._client_outboxes[stale_id] = stale_outbox
+            else:
+                self._logger.log(f"Evicted queued messages for offline user {stale_id}", 2)
 
     def _handshake(self, client: ImprovedSocket):
         """Handshake with a socket to establish its client ID, setup an encrypted connection and begin routing messages to/from it.
@@ -102,9 +148,7 @@ class Server:
         Args:
             client (NonStreamSocket): An instance of vcsms.non_stream_socket.NonStreamSocket which should be a wrapper around a newly connected tcp socket.
         """
-        pub_exp = hex(self._pub[0])[2:].encode()
-        pub_mod = hex(self._pub[1])[2:].encode()
-        client.send(pub_exp + b':' + pub_mod)
+        client.send(self._pub_blob)
         identity_packet = client.recv()
         if identity_packet == b"MalformedIdentity":
             self._logger.log("Connection failure. Client reported a malformed public key.", 1)
@@ -114,25 +158,30 @@ class Server:
             self._logger.log("Connection failure. Client reported a fingerprint mismatch.", 1)
             client.close()
             return
+        # the identity packet is the 32 character client ID followed by a
+        # 2 byte exponent length and the raw exponent and modulus bytes
         try:
-            c_id, c_exp, c_mod = identity_packet.split(b':')
-            c_id = c_id.decode()
-        except ValueError:
+            c_id = identity_packet[:32].decode()
+            exp_len = int.from_bytes(identity_packet[32:34], 'big')
+            if len(identity_packet) < 34 + exp_len + 1:
+                raise ValueError
+        except (UnicodeDecodeError, ValueError):
             self._logger.log("Connection failure. Malformed identity packet.", 1)
             client.send(b"MalformedIdentity")
             client.close()
             return
         self._logger.log(f"Client authenticating as {c_id}", 2)
-        client_pubkey = (int(c_exp, 16), int(c_mod, 16))
+        client_pubkey = (int.from_bytes(identity_packet[34:34 + exp_len], 'big'),
+                         int.from_bytes(identity_packet[34 + exp_len:], 'big'))
         if keys.fingerprint(client_pubkey) != c_id:
             self._logger.log(f"Connection failure. Public key hash mismatch for {c_id}", 1)
             client.send(b"PubKeyIdMismatch")
             client.close()
             return
 
-        dhke_priv = random.randrange(1, self._dhke_group[1])
+        dhke_priv = secrets.randbelow(self._dhke_group[1] - 1) + 1
         dhke_pub, dhke_sig = signing.gen_signed_dh(dhke_priv, self._priv, self._dhke_group)
-        client.send(hex(dhke_pub)[2:].encode() + b":" + dhke_sig)
+        client.send(dhke_pub.to_bytes(self._dhke_mod_len, 'big') + dhke_sig)
         pubkey_auth_packet = client.recv()
         if pubkey_auth_packet == b"BadSignature":
             self._logger.log(f"Connection failure. Client reported an incorrect signature.", 1)
@@ -142,109 +191,103 @@ class Server:
             self._logger.log(f"Connection failure. Client reported a malformed DH signature authentication packet.", 1)
             client.close()
             return
-        try:
-            c_dhke_pub, c_dhke_pub_sig = pubkey_auth_packet.split(b':')
-        except ValueError:
+        if len(pubkey_auth_packet) <= self._dhke_mod_len:
             self._logger.log(f"Connection failure. Malformed DH signature authentication packet.", 1)
             client.send(b"MalformedDiffieHellman")
             client.close()
             return
-        if not signing.verify(c_dhke_pub, c_dhke_pub_sig, client_pubkey):
+        c_dhke_pub = int.from_bytes(pubkey_auth_packet[:self._dhke_mod_len], 'big')
+        c_dhke_pub_sig = pubkey_auth_packet[self._dhke_mod_len:]
+        if not signing.verify_signed_dh(c_dhke_pub, c_dhke_pub_sig, client_pubkey):
             self._logger.log(f"Connection failure. Bad signature from {c_id}", 1)
             client.send(b"BadSignature")
             client.close()
             return
-        shared_key = dhke.calculate_shared_key(dhke_priv, int(c_dhke_pub, 16), self._dhke_group)
-        encryption_key = sha256.hash(utils.i_to_b(shared_key))
+        shared_key = dhke.calculate_shared_key(dhke_priv, c_dhke_pub, self._dhke_group)
+        shared_key_bytes = shared_key.to_bytes((shared_key.bit_length() + 7) // 8, 'big')
+        encryption_key = int.from_bytes(hashlib.sha256(shared_key_bytes).digest(), 'big')
         db = self._db_connect()
         try:
             db.user_login(c_id, client_pubkey)
         except IDCollisionException:
             self._logger.log(f"Connection Failure. Client ID {c_id} provided a key which collides with another.", 1)
-            db.close()
             client.send(b"IDCollision")
             client.close()
             return
+        with self._pubkey_cache_lock:
+            # the key (or its absence) may have been cached before this login
+            self._pubkey_cache.pop(c_id, None)
         self._logger.log(f"User {c_id} successfully authenticated", 1)
-        enc_iv = random.randrange(1, 2**128)
-        random_data = random.randbytes(32)
+        enc_iv = int.from_bytes(os.urandom(16), 'big')
+        random_data = os.urandom(32)
         encrypted_confirmation = aes256.encrypt_cbc(random_data, encryption_key, enc_iv)
-        client.send(hex(enc_iv)[2:].encode('utf-8') + b':' + encrypted_confirmation.hex().encode('utf-8'))
+        client.send(enc_iv.to_bytes(16, 'big') + encrypted_confirmation)
         client_confirm = client.recv()
-        if client_confirm == b"MalformedChallenge":
-            self._logger.log("Connection Failure. Client reported a malformed confirmation packet.", 1)
-            client.close()
-            return
         if client_confirm == b"CouldNotDecrypt":
             self._logger.log("Connection Failure. Client was unable to decrypt confirmation challenge.", 1)
             client.close()
             return
-        try:
-            client_confirm = bytes.fromhex(client_confirm.decode('utf-8'))
-        except ValueError:
-            self._logger.log("Connection Failure. Malformed challenge response.", 1)
-            client.send(b"MalformedResponse")
-            client.close()
-            return
-        if client_confirm != random_data:
+        if not hmac.compare_digest(client_confirm, random_data):
             self._logger.log("Connection Failure. Client did not confirm handshake success.", 1)
             client.send(b"Incorrect")
             client.close()
             return
         client.send(b"OK")
-        if c_id in self._client_outboxes:
-            outbox = self._client_outboxes[c_id]
-        else:
-            outbox = Queue()
-            self._client_outboxes[c_id] = outbox
-
-        self._client_sockets[c_id] = client
-        t_in = threading.Thread(target=self._in_thread, args=(client, encryption_key, c_id))
-        t_out = threading.Thread(target=self._out_thread, args=(client, outbox, encryption_key))
-        t_in.start()
-        t_out.start()
-        db.close()
+        with self._outbox_lock:
+            if c_id in self._client_outboxes:
+                outbox = self._client_outboxes[c_id]
+                self._client_outboxes.move_to_end(c_id)
+            else:
+                outbox = Queue(maxsize=OUTBOX_MAXSIZE)
+                self._client_outboxes[c_id] = outbox
+            self._client_sockets[c_id] = client
+        t_client = threading.Thread(target=self._client_thread, args=(client, outbox, encryption_key, c_id))
+        t_client.start()
 
     # thread methods
-    def _in_thread(self, client: ImprovedSocket, encryption_key: int, client_id: str):
-        """A function to be run by a thread which parses, handles if necessary, and routes incoming messages from a given client.
+    def _client_thread(self, client: ImprovedSocket, outbox: Queue, encryption_key: int, client_id: str):
+        """A function to be run by a thread which services all traffic for a given client:
+        parsing, handling if necessary, and routing incoming messages, and encrypting and
+        sending queued outgoing messages. One thread per client rather than one per direction
+        keeps the thread count (and GIL contention) down as the number of clients grows.
+        The AES-GCM transport calls run inside OpenSSL which releases the GIL, so client
+        threads encrypt and decrypt concurrently across cores; only the (cheap) message
+        parsing and queue handoff serialize.
 
         Args:
-            client (NonStreamSocket): The client socket to listen to.
+            client (NonStreamSocket): The client socket to service.
             encryption_key (int): The encryption key to use for all messages exchanged with the client.
+            outbox (Queue): A queue of messages meant for this client.
             client_id (str): The client ID associated with this socket.
         """
+        client_id_bytes = client_id.encode()
         while client.connected:
-            if client.new:
+            # sleep on the socket rather than polling it; the short timeout
+            # bounds how long a queued outgoing message waits while the
+            # client is quiet, without spinning when nothing is happening
+            try:
+                raw = client.recv(timeout=0.1)
+            except SocketException:
+                self._logger.log(f"Failed to receive data from {client_id}, socket disconnected", 2)
+                break
+            if raw is not None:
                 try:
-                    raw = client.recv()
-                    try:
-                        aes_iv, ciphertext = raw.decode().split(':', 1)
-                    except ValueError:
+                    if len(raw) < 12:
                         self._logger.log(f"Malformed message from {client_id}", 2)
-                        error_msg = self._message_parser.construct_message("0", "CiphertextMalformed")
-                        self._send(client_id, error_msg)
-                        continue
-                    try:
-                        aes_iv = int(aes_iv, 16)
-                    except ValueError:
-                        self._logger.log(f"Invalid initialization vector {aes_iv}", 2)
-                        error_msg = self._message_parser.construct_message("0", "InvalidIV")
-                        self._send(client_id, error_msg)
+                        self._send(client_id, self._error_frames["CiphertextMalformed"])
                         continue
+                    nonce = raw[:12]
                     try:
-                        data = aes256.decrypt_cbc(bytes.fromhex(ciphertext), encryption_key, aes_iv)
+                        data = aes256.decrypt_gcm(raw[12:], encryption_key, nonce)
                     except CryptographyException:
                         self._logger.log(f"Could not decrypt message from {client_id}", 2)
-                        error_msg = self._message_parser.construct_message("0", "MessageDecryptionFailure")
-                        self._send(client_id, error_msg)
+                        self._send(client_id, self._error_frames["MessageDecryptionFailure"])
                         continue
                     try:
                         recipient, message_type, message_values = self._message_parser.parse_message(data)
                     except MessageParseException as parse_exception:
                         self._logger.log(str(parse_exception), 2)
-                        error_msg = self._message_parser.construct_message("0", "MessageMalformed") 
-                        self._send(client_id, error_msg)
+                        self._send(client_id, self._error_frames["MessageMalformed"])
                         continue
 
                     if recipient == "0":
@@ -253,41 +296,32 @@ class Server:
                             self._send(client_id, response)
                     else:
                         self._logger.log(f"{message_type} {client_id} -> {recipient}", 4)
-                        to_send = self._message_parser.construct_message(client_id, message_type, *message_values)
-                        self._send(recipient, to_send)
+                        message_remainder = data.split(b':', 1)[1]
+                        self._send(recipient, client_id_bytes + b':' + message_remainder)
                 except SocketException:
                     self._logger.log(f"Failed to receive data from {client_id}, socket disconnected", 2)
                     continue
-        
+            # drain the outbox in batches so a burst of queued messages
+            # costs one gathered sendmsg syscall instead of one send each
+            message = outbox.pop(timeout=0)
+            while message is not None:
+                outgoing = []
+                while message is not None and len(outgoing) < 32:
+                    nonce = os.urandom(12)
+                    outgoing.append((nonce, aes256.encrypt_gcm(message, encryption_key, nonce)))
+                    message = outbox.pop(timeout=0)
+                try:
+                    client.send_many(outgoing)
+                except SocketException:
+                    self._logger.log("Failed to send data to client, socket disconnected", 2)
+                    break
+
         client.close()
         db = self._db_connect()
         db.user_logout(client_id)
-        db.close()
         self._logger.log(f"User {client_id} closed the connection", 1)
         self._client_sockets.pop(client_id)
 
-    def _out_thread(self, client: ImprovedSocket, outbox: Queue, encryption_key: int):
-        """A function to be run by a thread which constantly reads messages from
-        the outbox queue, encrypts them, and sends them to the given client socket.
-
-        Args:
-            sock (NonStreamSocket): The socket for the client with whom the outbox
-                is associated.
-            outbox (Queue): A queue of messages meant for a specific client.
-            encryption_key (int): The encryption key to for all messages exchanged
-                with the client.
-        """
-        while client.connected:
-            if not outbox.empty:
-                message = outbox.pop()
-                aes_iv = random.randrange(1, 2 ** 128)
-                ciphertext = aes256.encrypt_cbc(message, encryption_key, aes_iv).hex()
-                try:
-                    client.send(hex(aes_iv).encode() + b':' + ciphertext.encode('utf-8'))
-                except SocketException:
-                    self._logger.log("Failed to send data to client, socket disconnected", 2)
-                    continue
-
     # message type handler methods
     def _handler_get_key(self, sender: str, request_index: int, target_id: str) -> tuple[str, tuple]:
         """Handler function for the GetKey message type.
@@ -302,15 +336,25 @@ class Server:
                 KeyNotFound: The public key for the requested user could not be found.
         """
         self._logger.log(f"User {sender} requested key for user {target_id}", 3)
-        db = self._db_connect()
-        if db.user_known(target_id):
+        with self._pubkey_cache_lock:
+            in_cache = target_id in self._pubkey_cache
+            if in_cache:
+                self._pubkey_cache.move_to_end(target_id)
+                key = self._pubkey_cache[target_id]
+        if not in_cache:
+            # group chats fetch the same peers' keys over and over, so cache
+            # lookups (known or not) until the target next logs in
+            db = self._db_connect()
+            key = db.get_pubkey(target_id) if db.user_known(target_id) else None
+            with self._pubkey_cache_lock:
+                self._pubkey_cache[target_id] = key
+                while len(self._pubkey_cache) > MAX_CACHED_PUBKEYS:
+                    self._pubkey_cache.popitem(last=False)
+        if key is not None:
             self._logger.log(f"Key found for user {target_id}", 3)
-            key = db.get_pubkey(target_id)
-            db.close()
             return "KeyFound", (request_index, *key)
 
         self._logger.log(f"Key not found for user {target_id}", 3)
-        db.close()
         return "KeyNotFound", (request_index, )
 
     def _handler_quit(self, sender: str):
@@ -343,10 +387,16 @@ class Server:
         return "UnknownMessageType", (message_type, )
 
     def _db_connect(self) -> Server_DB:
-        """Get a connection to the server database.
+        """Get this thread's connection to the server database.
+        Opening sqlite costs a file open and statement-cache warmup, so each
+        thread keeps one connection for its lifetime instead of opening and
+        closing around every operation.
 
         Returns:
             Server_DB: An server database connection object
         """
-        db = Server_DB(self._db_path, self._pubkey_path)
+        db = getattr(self._db_local, 'db', None)
+        if db is None:
+            db = Server_DB(self._db_path, self._pubkey_path)
+            self._db_local.db = db
         return db
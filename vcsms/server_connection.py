@@ -1,5 +1,7 @@
+import hashlib
+import os
 import socket
-import random
+import secrets
 import threading
 from .queue import Queue
 
@@ -7,11 +9,24 @@ from . import keys
 from . import signing
 from .improved_socket import ImprovedSocket
 from .logger import Logger
-from .cryptography import dhke, sha256, utils, aes256
+from .cryptography import dhke, aes256
 from .cryptography.exceptions import CryptographyException, DecryptionFailureException
 from .exceptions.server_connection import *
 from .exceptions.socket import SocketException
 
+_SHUTDOWN = object()  # queued to tell the sending thread to close the socket
+
+# error frames the server can send in place of each handshake packet
+_AUTH_ERRORS = {
+    b"MalformedIdentity": "Malformed identity packet",
+    b"PubKeyIdMismatch": "Public key fingerprint does not match client ID"
+}
+_CONFIRMATION_ERRORS = {
+    b"MalformedDiffieHellman": "Malformed DH authentication packet",
+    b"BadSignature": "Incorrectly signed diffie hellman public key",
+    b"IDCollision": "Public key collision for client ID"
+}
+
 
 class ServerConnection:
     """An encrypted connection to a server which speaks the VCSMS handshaking protocol."""
@@ -26,6 +41,11 @@ class ServerConnection:
         """
         s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # most messages are far smaller than an MTU so Nagle's algorithm
+        # would hold each one back waiting for an ack on the previous
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
         self._socket = ImprovedSocket(s)
         self._ip = ip
         self._port = port
@@ -34,7 +54,6 @@ class ServerConnection:
         self._encryption_key = 0
         self._in_queue = Queue()
         self._out_queue = Queue()
-        self._send_lock = threading.Lock()
 
     @property
     def connected(self) -> bool:
@@ -60,78 +79,68 @@ class ServerConnection:
             ServerConnectionAbort: The server aborted the connection
             KeyConfirmationFailureException: The established shared key failed confirmation
         """
-        pub_exp = hex(pub_key[0])[2:].encode()
-        pub_mod = hex(pub_key[1])[2:].encode()
-        try:
-            server_exp, server_mod = self._socket.recv().split(b':')
-            server_public_key = (int(server_exp, 16), int(server_mod, 16))
-        except ValueError:
+        # identity packets carry a 2 byte exponent length followed by the
+        # raw exponent and modulus bytes rather than ASCII hex
+        identity_packet = self._socket.recv()
+        server_exp_len = int.from_bytes(identity_packet[:2], 'big')
+        if len(identity_packet) < 2 + server_exp_len + 1:
             self._socket.send(b"MalformedIdentity")
             self._socket.close()
             raise MalformedPacketException()
-        if keys.fingerprint(server_public_key, 64) != self._fp:
+        server_public_key = (int.from_bytes(identity_packet[2:2 + server_exp_len], 'big'),
+                             int.from_bytes(identity_packet[2 + server_exp_len:], 'big'))
+        server_fingerprint = keys.fingerprint(server_public_key, 64)
+        if server_fingerprint != self._fp:
             self._socket.send(b"PubKeyFpMismatch")
             self._socket.close()
-            raise PublicKeyIdMismatchException(keys.fingerprint(server_public_key), self._fp)
+            raise PublicKeyIdMismatchException(server_fingerprint, self._fp)
 
         pub_key_hash = keys.fingerprint(pub_key).encode()
-        self._socket.send(pub_key_hash + b":" + pub_exp + b":" + pub_mod)
+        pub_exp = pub_key[0].to_bytes((pub_key[0].bit_length() + 7) // 8, 'big')
+        pub_mod = pub_key[1].to_bytes((pub_key[1].bit_length() + 7) // 8, 'big')
+        self._socket.send(pub_key_hash + len(pub_exp).to_bytes(2, 'big') + pub_exp + pub_mod)
 
-        dhke_priv = random.randrange(1, dhke_group[1])
+        dhke_mod_len = (dhke_group[1].bit_length() + 7) // 8
+        dhke_priv = secrets.randbelow(dhke_group[1] - 1) + 1
         dhke_pub, dhke_sig = signing.gen_signed_dh(dhke_priv, priv_key, dhke_group)
 
         server_auth_packet = self._socket.recv()
-        if server_auth_packet == b"MalformedIdentity":
-            self._socket.close()
-            raise ServerConnectionAbort("Malformed identity packet")
-        elif server_auth_packet == b"PubKeyIdMismatch":
+        error = _AUTH_ERRORS.get(server_auth_packet)
+        if error is not None:
             self._socket.close()
-            raise ServerConnectionAbort("Public key fingerprint does not match client ID")
-        try:
-            s_dhke_pub, s_dhke_pub_sig = server_auth_packet.split(b':')
-        except ValueError:
+            raise ServerConnectionAbort(error)
+        if len(server_auth_packet) <= dhke_mod_len:
             self._socket.send(b"MalformedDiffieHellman")
             self._socket.close()
             raise MalformedPacketException()
+        s_dhke_pub = int.from_bytes(server_auth_packet[:dhke_mod_len], 'big')
+        s_dhke_pub_sig = server_auth_packet[dhke_mod_len:]
 
-        if not signing.verify(s_dhke_pub, s_dhke_pub_sig, server_public_key):
+        if not signing.verify_signed_dh(s_dhke_pub, s_dhke_pub_sig, server_public_key):
             self._socket.send(b"BadSignature")
             self._socket.close()
             raise SignatureVerifyFailureException(s_dhke_pub_sig)
 
-        self._socket.send(hex(dhke_pub)[2:].encode() + b":" + dhke_sig)
-        shared_key = dhke.calculate_shared_key(dhke_priv, int(s_dhke_pub, 16), dhke_group)
-        self._encryption_key = sha256.hash(utils.i_to_b(shared_key))
+        self._socket.send(dhke_pub.to_bytes(dhke_mod_len, 'big') + dhke_sig)
+        shared_key = dhke.calculate_shared_key(dhke_priv, s_dhke_pub, dhke_group)
+        shared_key_bytes = shared_key.to_bytes((shared_key.bit_length() + 7) // 8, 'big')
+        self._encryption_key = int.from_bytes(hashlib.sha256(shared_key_bytes).digest(), 'big')
 
         encrypted_confirmation = self._socket.recv()
-        if encrypted_confirmation == b"MalformedDiffieHellman":
-            self._socket.close()
-            raise ServerConnectionAbort("Malformed DH authentication packet")
-        elif encrypted_confirmation == b"BadSignature":
-            self._socket.close()
-            raise ServerConnectionAbort("Incorrectly signed diffie hellman public key")
-        elif encrypted_confirmation == b"IDCollision":
+        error = _CONFIRMATION_ERRORS.get(encrypted_confirmation)
+        if error is not None:
             self._socket.close()
-            raise ServerConnectionAbort("Public key collision for client ID")
-        try:
-            iv, ciphertext = encrypted_confirmation.split(b':')
-            iv = int(iv, 16)
-            ciphertext = bytes.fromhex(ciphertext.decode('utf-8'))
-        except ValueError:
-            self._socket.send(b"MalformedChallenge")
-            self._socket.close()
-            raise MalformedPacketException()
+            raise ServerConnectionAbort(error)
+        iv = int.from_bytes(encrypted_confirmation[:16], 'big')
+        ciphertext = encrypted_confirmation[16:]
         try:
             plaintext = aes256.decrypt_cbc(ciphertext, self._encryption_key, iv)
         except DecryptionFailureException:
             self._socket.send(b"CouldNotDecrypt")
             self._socket.close()
             raise KeyConfirmationFailureException()
-        self._socket.send(plaintext.hex().encode('utf-8'))
+        self._socket.send(plaintext)
         response = self._socket.recv()
-        if response == b"MalformedResponse":
-            self._socket.close()
-            raise ServerConnectionAbort("Malformed challenge response")
         if response != b"OK":
             self._socket.close()
             raise ServerConnectionAbort("Failed challenge-response confirmation for shared key")
@@ -152,68 +161,60 @@ class ServerConnection:
             self._handshake(pub_key, priv_key, dhke.group14_2048)
         except SocketException as exc:
             raise NetworkError(exc)
-        t_in = threading.Thread(target=self._in_thread, args=())
-        t_out = threading.Thread(target=self._out_thread, args=())
-        t_in.start()
-        t_out.start()
-
-    def _in_thread(self):
-        """A function to be run by a thread which receives, parses and decrypts messages from the server."""
+        t_io = threading.Thread(target=self._io_thread, args=())
+        t_io.start()
+
+    def _io_thread(self):
+        """A function to be run by a thread which services both directions of
+        the connection: receiving, decrypting and queueing incoming messages,
+        and encrypting and sending queued outgoing messages. One thread per
+        connection rather than one per direction, mirroring the server's
+        per-client thread. Sleeps on the socket between messages; the short
+        timeout bounds how long a queued outgoing message waits while the
+        server is quiet."""
         while self._socket.connected:
-            if self._socket.new:
-                try:
-                    data = self._socket.recv()
-                except SocketException as exc:
-                    self._logger.log(f"Connection to server died: {exc.message}", 1)
-                    continue
-                try:
-                    iv, data = data.split(b':')
-                    data = bytes.fromhex(data.decode('utf-8'))
-                except ValueError:
+            try:
+                data = self._socket.recv(timeout=0.1)
+            except SocketException as exc:
+                self._logger.log(f"Connection to server died: {exc.message}", 1)
+                break
+            if data is not None:
+                if len(data) < 12:
                     self._logger.log("Server sent a malformed packet", 2)
                     self.send(b"0:CiphertextMalformed:")
-                    continue
-                try:
-                    iv = int(iv, 16)
-                except ValueError:
-                    self._logger.log("Server sent an invalid initialisation vector", 2)
-                    self.send(b"0:InvalidIV:")
-                    continue
-                try:
-                    message = aes256.decrypt_cbc(data, self._encryption_key, iv)
-                except CryptographyException:
-                    self._logger.log("Failed to decrypt message from server", 2)
-                    self.send(b"0:MessageDecryptionFailure:")
-                    continue
-                self._in_queue.push(message)
-
-    def _out_thread(self):
-        """A function to be run by a thread which encrypts, formats 
-        and sends messages in the outgoing queue to the server."""
-        while self._socket.connected:
-            if not self._out_queue.empty:
-                with self._send_lock:
-                    message = self._out_queue.pop()
-                    iv = random.randrange(1, 2 ** 128)
-                    encrypted = aes256.encrypt_cbc(message, self._encryption_key, iv)
+                else:
+                    nonce = data[:12]
                     try:
-                        self._socket.send(hex(iv)[2:].encode() + b':' + encrypted.hex().encode())
-                    except SocketException as exc:
-                        self._logger.log(f"Connection to server died: {exc.message}", 1)
-                        continue
+                        message = aes256.decrypt_gcm(data[12:], self._encryption_key, nonce)
+                        self._in_queue.push(message)
+                    except CryptographyException:
+                        self._logger.log("Failed to decrypt message from server", 2)
+                        self.send(b"0:MessageDecryptionFailure:")
+            message = self._out_queue.pop(timeout=0)
+            while message is not None:
+                if message is _SHUTDOWN:
+                    self._socket.close()
+                    self._logger.log("Closed connection to server", 2)
+                    break
+                nonce = os.urandom(12)
+                encrypted = aes256.encrypt_gcm(message, self._encryption_key, nonce)
+                try:
+                    self._socket.send(nonce, encrypted)
+                except SocketException as exc:
+                    self._logger.log(f"Connection to server died: {exc.message}", 1)
+                    break
+                message = self._out_queue.pop(timeout=0)
+        self._in_queue.push(None)  # wake any thread blocked in recv
 
     def close(self):
         """Shutdown the connection to the server once all queued messages have been sent."""
         if self._socket.connected:
             self._logger.log("Trying to close connection to server", 3)
-            while True:
-                if self._out_queue.empty:
-                    with self._send_lock:
-                        self._logger.log("Able to close connection", 3)
-                        self._socket.close()
-                        self._logger.log("Closed connection to server", 2)
-                    break
-        self._logger.log("Connection to server already closed", 2)
+            # the sending thread closes the socket when it reaches this
+            # marker, by which point everything queued before it has gone out
+            self._out_queue.push(_SHUTDOWN)
+        else:
+            self._logger.log("Connection to server already closed", 2)
 
     def send(self, data: bytes):
         """Queue some data to be sent to the server.
@@ -231,7 +232,8 @@ class ServerConnection:
         """Block until a new piece of data is available from the connection and then return it.
 
         Returns:
-            bytes: The data received from the server.
+            bytes: The data received from the server,
+                or None if the connection closed while waiting.
         """
         if self._socket.connected:
             return self._in_queue.pop()
@@ -14,6 +14,10 @@ class Server_DB:
             pubkey_directory (str, optional): The directory in which to store all client public keys. Defaults to 'client_public_keys'.
         """
         self._db = sqlite3.connect(path)
+        # write-ahead logging lets readers run concurrently with a writer,
+        # which suits the read-heavy public key lookup workload
+        self._db.execute("pragma journal_mode=WAL")
+        self._db.execute("pragma synchronous=NORMAL")
         self._pubkeys = pubkey_directory
 
     def setup_db(self):
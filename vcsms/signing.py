@@ -1,5 +1,7 @@
+import hashlib
 import time
-from .cryptography import rsa, sha256, dhke
+from .cryptography import rsa, dhke
+from .cryptography.utils import i_to_b
 from .cryptography.exceptions import CryptographyException, DecryptionFailureException
 
 def sign(data: bytes, priv_key: tuple, ttl: int = 60) -> bytes:
@@ -15,7 +17,7 @@ def sign(data: bytes, priv_key: tuple, ttl: int = 60) -> bytes:
     """
     timestamp = time.time_ns().to_bytes(8, 'big')
     time_to_live = (ttl*1000000000).to_bytes(8, 'big')
-    data_hash = sha256.hash(data).to_bytes(32, 'big')
+    data_hash = hashlib.sha256(data).digest()
     sig_data = timestamp + time_to_live + data_hash
     signature = rsa.encrypt(sig_data, *priv_key)
     return signature.hex().encode('utf-8')
@@ -32,7 +34,7 @@ def verify(data: bytes, signature: bytes, pub_key: tuple) -> bool:
     Returns:
         bool: Whether the signature is valid
     """
-    data_hash = sha256.hash(data)
+    data_hash = int.from_bytes(hashlib.sha256(data).digest(), 'big')
     try:
         signature_bytes = bytes.fromhex(signature.decode('utf-8'))
     except ValueError:
@@ -66,12 +68,11 @@ def gen_signed_dh(dh_private_key: int, rsa_private_key: tuple,
         tuple[int, bytes]: The diffie hellman public key and signature
     """
     dh_public_key = dhke.generate_public_key(dh_private_key, dh_group)
-    dh_public_key_hex = hex(dh_public_key)[2:].encode()
-    message_id_hex = hex(message_id)[2:].encode()
+    dh_public_key_bytes = i_to_b(dh_public_key)
     if message_id:
-        dh_signature = sign(dh_public_key_hex + b':' + message_id_hex, rsa_private_key)
+        dh_signature = sign(dh_public_key_bytes + message_id.to_bytes(8, 'big'), rsa_private_key)
     else:
-        dh_signature = sign(dh_public_key_hex, rsa_private_key)
+        dh_signature = sign(dh_public_key_bytes, rsa_private_key)
     return dh_public_key, dh_signature
 
 def verify_signed_dh(dh_public_key: int, signature: bytes, 
@@ -87,10 +88,9 @@ def verify_signed_dh(dh_public_key: int, signature: bytes,
     Returns:
         bool: Whether or not the key was signed correctly.
     """
-    dh_public_key_hex = hex(dh_public_key)[2:].encode()
-    message_id_hex = hex(message_id)[2:].encode()
+    dh_public_key_bytes = i_to_b(dh_public_key)
     if message_id:
-        sig_data = dh_public_key_hex + b':' + message_id_hex
+        sig_data = dh_public_key_bytes + message_id.to_bytes(8, 'big')
     else:
-        sig_data = dh_public_key_hex
+        sig_data = dh_public_key_bytes
     return verify(sig_data, signature, rsa_public_key)